@@ -1,5 +1,6 @@
 """Physical Camera — realistic lens simulation for Blender's OSL camera."""
 
+from math import degrees, isclose
 from pathlib import Path
 
 import bpy
@@ -9,41 +10,155 @@ from bpy.props import (
     EnumProperty,
     FloatProperty,
     IntProperty,
+    StringProperty,
 )
 
 from . import codegen, diagram, scene_lights
 
-_TEXT_BLOCK_NAME = "Physical Lens OSL"
+# Each lens gets its own text block, named "<prefix>: <filename_stem>"
+_TEXT_BLOCK_PREFIX = "Physical Lens OSL"
+# Camera ID property set by the enable/disable operators so poll() and draw()
+# don't have to resolve the custom shader on every redraw
+_ACTIVE_FLAG = "_phys_lens_active"
+# Seconds of depsgraph quiet before scene lights are re-collected
+_LIGHT_UPDATE_DELAY = 0.05
+# Depsgraph update sources that can change the collected scene lights
+_OBJECT_TYPE = bpy.types.Object
+_LIGHT_OBJECT_TYPES = frozenset(('LIGHT', 'MESH'))
+_LIGHT_DATA_TYPES = (bpy.types.Light, bpy.types.Material)
+# debug_mode enum items in shader order; the index is the OSL debug_mode value
+_DEBUG_MODE_ITEMS = (
+    ("NORMAL", "Normal", "Standard rendering"),
+    ("PINHOLE", "Pinhole", "Pinhole camera (no lens)"),
+    ("DIAGNOSTIC", "Diagnostic", "Failure cause visualization"),
+    ("EXIT_DIR", "Exit Direction", "Exit ray direction as RGB"),
+    ("GHOSTS_ONLY", "Ghosts Only", "Show only ghost reflections"),
+    ("GHOST_AIM", "Ghost Aim", "Light-aimed ghost diagnostic"),
+)
+_DEBUG_MODE_INDEX = {
+    item[0]: float(i) for i, item in enumerate(_DEBUG_MODE_ITEMS)
+}
+# Shader parameters within this relative tolerance of the stored value are
+# left alone; float parameters are stored as float32 in cycles_custom, so
+# they don't round-trip exactly
+_PARAM_REL_TOL = 1e-6
 
 _lens_registry: list[dict] = []
-_lens_items: list[tuple] = []
+# Per-lens fields read on every sync/redraw, indexed like _lens_registry
+_lens_max_fstop: tuple[float, ...] = ()
+_lens_focal_length: tuple[float, ...] = ()
+_lens_items: tuple[tuple[str, str, str], ...] = ()
 _lens_index_map: dict[str, int] = {}
-_osl_source: str = ""
-_osl_source_base: str = ""
+# Per-lens OSL source, split where the scene lights go, and text block name
+_lens_osl_base: tuple[tuple[str, str], ...] = ()
+_lens_text_names: tuple[str, ...] = ()
+_current_lights: list = []
+_current_lights_key: tuple = ()
 _updating_lights: bool = False
 _cached_light_key = None
+# Whether the last collected lights could change between frames, and the
+# scene camera they were collected for; while neither changes, frame
+# changes leave the shaders alone
+_lights_animated: bool = False
+_lights_camera_name: str | None = None
+# Text blocks and the lights key their source was last written with, by
+# name. A text's source is fully determined by its lens and the lights, so
+# the key alone tells whether it is up to date.
+_text_blocks: dict = {}
+_written_light_keys: dict[str, tuple] = {}
+# Names of cameras using the physical lens. Names rather than bpy objects:
+# RNA wrappers are recreated on access, so they can't be held in a set.
+_physical_cams: set[str] = set()
+# Whether any camera in _physical_cams has ghosts or diffraction enabled,
+# i.e. whether light edits can change any shader
+_needs_lights: bool = False
+# Names of cameras whose lens changed since the last _flush_rebuilds()
+_pending_rebuilds: set[str] = set()
 
 
 def _lens_index(props):
-    idx = _lens_index_map.get(props.lens)
-    if idx is not None:
-        return idx
-    if props.lens.isdigit():
-        i = int(props.lens)
-        if 0 <= i < len(_lens_registry):
-            return i
-    return 0
-
-
-def _get_or_create_text_block():
-    """Get or create the text datablock containing the generated OSL shader."""
-    if _TEXT_BLOCK_NAME in bpy.data.texts:
-        text = bpy.data.texts[_TEXT_BLOCK_NAME]
-    else:
-        text = bpy.data.texts.new(_TEXT_BLOCK_NAME)
-    text.clear()
-    text.write(_osl_source)
-    return text
+    return _lens_index_map.get(props.lens, 0)
+
+
+def _refresh_lens_index_cache():
+    """Recompute cached_lens_index on cameras that use the physical lens.
+
+    The value is saved with the file, but lens indices shift when lenses are
+    added or removed, so load_post recomputes it regardless. last_lens is
+    synced too, so files saved before it existed don't take their first
+    property edit for a lens change. Other cameras get both when the lens is
+    enabled on them; linked cameras can't be written at all.
+    """
+    for cam in bpy.data.cameras:
+        if cam.library is not None:
+            continue
+        if _ACTIVE_FLAG not in cam and not _has_physical_lens_shader(cam):
+            continue
+        props = cam.physical_camera
+        lens_index = _lens_index(props)
+        if props.cached_lens_index != lens_index:
+            props.cached_lens_index = lens_index
+        if props.last_lens != props.lens:
+            props.last_lens = props.lens
+
+
+def _get_or_create_text_block(lens_index):
+    """Get or create the text datablock containing one lens's OSL shader.
+
+    The text is only rewritten when the scene lights changed since it was
+    last written, so repeated calls neither regenerate the source nor churn
+    the datablock. Returns (text, rewritten).
+    """
+    name = _lens_text_names[lens_index]
+    text = _text_blocks.get(name)
+    try:
+        if text is not None and text.name != name:
+            text = None
+    except ReferenceError:
+        text = None
+    if text is None:
+        text = bpy.data.texts.get(name)
+        if text is None:
+            text = bpy.data.texts.new(name)
+            _written_light_keys.pop(name, None)
+        _text_blocks[name] = text
+
+    if _written_light_keys.get(name) == _current_lights_key:
+        return text, False
+    text.from_string(codegen.inject_scene_lights(
+        _lens_osl_base[lens_index], _current_lights, _current_lights_key
+    ))
+    _written_light_keys[name] = _current_lights_key
+    return text, True
+
+
+def _forget_text_blocks():
+    """Drop the cached text blocks and their written light keys.
+
+    Needed whenever Blender may have replaced or reverted the datablocks
+    behind our back (file load, undo/redo).
+    """
+    _text_blocks.clear()
+    _written_light_keys.clear()
+
+
+def _build_camera_shader(cam, built=None):
+    """Assign cam the text block for its lens, rewriting it if stale.
+
+    built maps lens index to a (text, rewritten) result already obtained
+    in this pass, so cameras sharing a lens only build its source once.
+    """
+    lens_index = cam.physical_camera.cached_lens_index
+    if built is None:
+        built = {}
+    if lens_index not in built:
+        built[lens_index] = _get_or_create_text_block(lens_index)
+    text, rewritten = built[lens_index]
+    # Reassign a rewritten text even when it is already the camera's shader:
+    # the assignment is what makes Blender recompile the edited text.
+    if rewritten or cam.custom_shader != text:
+        cam.custom_shader = text
+    sync_to_cycles(cam)
 
 
 def sync_to_cycles(cam):
@@ -54,58 +169,93 @@ def sync_to_cycles(cam):
         return
 
     props = cam.physical_camera
-    lens_index = _lens_index(props)
-
-    custom["lens_type"] = lens_index
-    custom["aperture_blades"] = props.aperture_blades
-    from math import degrees
-    custom["blade_rotation"] = degrees(props.blade_rotation)
-    custom["chromatic_aberration"] = 1 if props.chromatic_aberration else 0
-    custom["lens_ghosts"] = 1 if props.lens_ghosts else 0
-    custom["ghost_intensity"] = props.ghost_intensity
-    custom["diffraction"] = 1 if props.diffraction else 0
-
-    debug_map = {"NORMAL": 0.0, "PINHOLE": 1.0, "DIAGNOSTIC": 2.0, "EXIT_DIR": 3.0, "GHOSTS_ONLY": 4.0, "GHOST_AIM": 5.0}
-    custom["debug_mode"] = debug_map[props.debug_mode]
-
-    if lens_index < len(_lens_registry):
-        max_fstop = _lens_registry[lens_index]["max_fstop"]
-        custom["aperture_scale"] = min(max_fstop / props.fstop, 1.0)
+    lens_index = props.cached_lens_index
+
+    if lens_index < len(_lens_max_fstop):
+        aperture_scale = min(_lens_max_fstop[lens_index] / props.fstop, 1.0)
     else:
-        custom["aperture_scale"] = 1.0
+        aperture_scale = 1.0
+
+    values = {
+        "aperture_blades": props.aperture_blades,
+        "blade_rotation": degrees(props.blade_rotation),
+        "chromatic_aberration": 1 if props.chromatic_aberration else 0,
+        "lens_ghosts": 1 if props.lens_ghosts else 0,
+        "ghost_intensity": props.ghost_intensity,
+        "diffraction": 1 if props.diffraction else 0,
+        "debug_mode": _DEBUG_MODE_INDEX[props.debug_mode],
+        "aperture_scale": aperture_scale,
+    }
+    # Only write changed values: each assignment crosses into RNA and marks
+    # the camera's shader parameters dirty for Cycles.
+    for key, value in values.items():
+        old = custom.get(key)
+        if old is None or not isclose(
+                old, value, rel_tol=_PARAM_REL_TOL, abs_tol=1e-9):
+            custom[key] = value
 
 
 def _sync_focal_length(cam, lens_index):
-    if lens_index < len(_lens_registry):
-        cam.lens = _lens_registry[lens_index]["focal_length"]
-
-
-def _on_lens_change(self, context):
-    lens_index = _lens_index(self)
-    if lens_index < len(_lens_registry):
-        max_fstop = _lens_registry[lens_index]["max_fstop"]
-        if self.fstop < max_fstop:
-            self.fstop = max_fstop
-    cam = context.object.data if context.object else None
-    if cam:
-        _sync_focal_length(cam, lens_index)
-        sync_to_cycles(cam)
+    if lens_index < len(_lens_focal_length):
+        cam.lens = _lens_focal_length[lens_index]
 
 
 def _on_property_change(self, context):
-    cam = context.object.data if context.object else None
-    if cam:
-        sync_to_cycles(cam)
+    """Shared update callback for all PhysicalCameraProperties."""
+    cam = self.id_data
+    if not self.last_lens:
+        # Never handled yet (new camera or older file): nothing to compare
+        # against, so record the lens rather than take this for a change
+        self.last_lens = self.lens
+    elif self.last_lens != self.lens:
+        self.last_lens = self.lens
+        lens_index = _lens_index(self)
+        self.cached_lens_index = lens_index
+        if lens_index < len(_lens_max_fstop):
+            max_fstop = _lens_max_fstop[lens_index]
+            if self.fstop < max_fstop:
+                self.fstop = max_fstop
+        _sync_focal_length(cam, lens_index)
+        if _is_using_physical_lens(cam):
+            _schedule_rebuild(cam)
+    sync_to_cycles(cam)
 
 
 def _on_light_feature_toggle(self, context):
     global _cached_light_key
     _cached_light_key = None
-    cam = context.object.data if context.object else None
-    if cam:
-        sync_to_cycles(cam)
-    if context.scene:
-        _update_scene_lights(context.scene)
+    cam = self.id_data
+    # _physical_cams may not know this camera yet (e.g. set up through the
+    # Python API), and _refresh_needs_lights() only looks at that set
+    if _is_using_physical_lens(cam) and cam.name not in _physical_cams:
+        _physical_cams.add(cam.name)
+        _ensure_handlers_attached()
+    _refresh_needs_lights()
+    _on_property_change(self, context)
+    _schedule_light_update(0.0)
+
+
+def _schedule_rebuild(cam):
+    """Queue cam's shader for rebuilding on the next timer tick.
+
+    Several lens changes before the next redraw (e.g. scrolling through the
+    lens menu) then cost one rebuild per camera instead of one per change.
+    """
+    _pending_rebuilds.add(cam.name)
+    if not bpy.app.timers.is_registered(_flush_rebuilds):
+        bpy.app.timers.register(_flush_rebuilds, first_interval=0.0)
+
+
+def _flush_rebuilds():
+    """Timer callback that rebuilds the shaders queued by _schedule_rebuild."""
+    cameras = bpy.data.cameras
+    built = {}
+    for name in _pending_rebuilds:
+        cam = cameras.get(name)
+        if cam is not None and _is_using_physical_lens(cam):
+            _build_camera_shader(cam, built)
+    _pending_rebuilds.clear()
+    return None
 
 
 class PhysicalCameraProperties(bpy.types.PropertyGroup):
@@ -113,6 +263,17 @@ class PhysicalCameraProperties(bpy.types.PropertyGroup):
     # items list so Blender stores the string identifier, not the integer index.
     # A callback-based items= would store an integer that breaks when lenses are
     # added or removed and the alphabetical order shifts.
+    cached_lens_index: IntProperty(
+        name="Cached Lens Index",
+        description="Registry index of the selected lens (updated on lens change)",
+        default=0,
+        options={'HIDDEN'},
+    )
+    last_lens: StringProperty(
+        name="Last Lens",
+        description="Lens identifier last handled by the update callback",
+        options={'HIDDEN'},
+    )
     fstop: FloatProperty(
         name="f-stop",
         min=0.5,
@@ -167,26 +328,75 @@ class PhysicalCameraProperties(bpy.types.PropertyGroup):
     )
     debug_mode: EnumProperty(
         name="Debug Mode",
-        items=[
-            ("NORMAL", "Normal", "Standard rendering"),
-            ("PINHOLE", "Pinhole", "Pinhole camera (no lens)"),
-            ("DIAGNOSTIC", "Diagnostic", "Failure cause visualization"),
-            ("EXIT_DIR", "Exit Direction", "Exit ray direction as RGB"),
-            ("GHOSTS_ONLY", "Ghosts Only", "Show only ghost reflections"),
-            ("GHOST_AIM", "Ghost Aim", "Light-aimed ghost diagnostic"),
-        ],
+        items=_DEBUG_MODE_ITEMS,
         default="NORMAL",
         update=_on_property_change,
     )
 
 
 def _is_using_physical_lens(cam):
+    # The flag is only a fast negative: a flagged camera may since have been
+    # given another shader, which must not be overwritten with ours.
+    return bool(cam.get(_ACTIVE_FLAG, False)) and _has_physical_lens_shader(cam)
+
+
+def _has_physical_lens_shader(cam):
     return (
         cam.type == 'CUSTOM'
         and cam.custom_mode == 'INTERNAL'
         and cam.custom_shader is not None
-        and cam.custom_shader.name == _TEXT_BLOCK_NAME
+        and cam.custom_shader.name.startswith(_TEXT_BLOCK_PREFIX)
+    )
+
+
+def _refresh_physical_cams():
+    """Rebuild the set of cameras using the physical lens with a full scan."""
+    _physical_cams.clear()
+    _physical_cams.update(
+        cam.name for cam in bpy.data.cameras if _is_using_physical_lens(cam)
     )
+    _refresh_needs_lights()
+
+
+def _refresh_needs_lights():
+    """Recompute _needs_lights from the cameras in _physical_cams."""
+    global _needs_lights
+    cameras = bpy.data.cameras
+    for name in _physical_cams:
+        cam = cameras.get(name)
+        if cam is not None:
+            props = cam.physical_camera
+            if props.lens_ghosts or props.diffraction:
+                _needs_lights = True
+                return
+    _needs_lights = False
+
+
+def _iter_physical_cams():
+    """Return the cameras in _physical_cams that still use the physical lens.
+
+    A missing name means a camera was renamed or removed since the set was
+    built, so fall back to a full rescan.
+    """
+    cameras = bpy.data.cameras
+    cams = [cameras.get(name) for name in _physical_cams]
+    if None in cams:
+        _refresh_physical_cams()
+        cams = [cameras[name] for name in _physical_cams]
+    return [cam for cam in cams if _is_using_physical_lens(cam)]
+
+
+def _refresh_active_flags():
+    """Recompute each camera's active flag from its shader assignment."""
+    for cam in bpy.data.cameras:
+        if cam.library is not None:
+            # Linked cameras can't be written; they keep the library's flag
+            continue
+        active = _has_physical_lens_shader(cam)
+        # Don't add the flag to cameras that never used the physical lens
+        if (active or _ACTIVE_FLAG in cam) and cam.get(_ACTIVE_FLAG) != active:
+            cam[_ACTIVE_FLAG] = active
+    _refresh_physical_cams()
 
 
 class CAMERA_OT_apply_physical_lens(bpy.types.Operator):
@@ -204,13 +414,18 @@ class CAMERA_OT_apply_physical_lens(bpy.types.Operator):
 
     def execute(self, context):
         cam = context.object.data
-        text = _get_or_create_text_block()
         cam.type = 'CUSTOM'
         cam.custom_mode = 'INTERNAL'
-        cam.custom_shader = text
-        lens_index = _lens_index(cam.physical_camera)
+        cam[_ACTIVE_FLAG] = True
+        props = cam.physical_camera
+        lens_index = _lens_index(props)
+        props.cached_lens_index = lens_index
+        props.last_lens = props.lens
         _sync_focal_length(cam, lens_index)
-        sync_to_cycles(cam)
+        _build_camera_shader(cam)
+        _physical_cams.add(cam.name)
+        _refresh_needs_lights()
+        _ensure_handlers_attached()
         return {'FINISHED'}
 
 
@@ -231,6 +446,10 @@ class CAMERA_OT_disable_physical_lens(bpy.types.Operator):
     def execute(self, context):
         cam = context.object.data
         cam.type = 'PERSP'
+        cam[_ACTIVE_FLAG] = False
+        _physical_cams.discard(cam.name)
+        _refresh_needs_lights()
+        _detach_handlers_if_idle()
         return {'FINISHED'}
 
 
@@ -262,10 +481,10 @@ class CAMERA_PT_physical_lens(bpy.types.Panel):
 
         layout.prop(props, "lens")
 
-        lens_index = _lens_index(props)
+        lens_index = props.cached_lens_index
 
-        if lens_index < len(_lens_registry):
-            max_fstop = _lens_registry[lens_index]["max_fstop"]
+        if lens_index < len(_lens_max_fstop):
+            max_fstop = _lens_max_fstop[lens_index]
             layout.prop(props, "fstop", text=f"f-stop (min f/{max_fstop})")
         else:
             layout.prop(props, "fstop")
@@ -329,108 +548,193 @@ def _draw_object_context_menu(self, context):
         self.layout.operator("camera.disable_physical_lens")
 
 
-def _lights_key(lights):
-    return tuple(
-        (lt['type'], lt['pos'], lt['dir'], lt['intensity'], lt['radius'])
-        for lt in lights
-    )
-
-
 def _update_scene_lights(scene):
-    """Collect lights from scene and regenerate the shader text block."""
-    global _osl_source, _updating_lights, _cached_light_key
+    """Collect lights from scene and regenerate the in-use shader text blocks."""
+    global _current_lights, _current_lights_key, _updating_lights
+    global _cached_light_key, _lights_animated, _lights_camera_name
+    if not _needs_lights and _cached_light_key == ():
+        # Shaders already carry no lights and none are wanted
+        return
     cam_obj = scene.camera
-    if cam_obj is None or not _is_using_physical_lens(cam_obj.data):
-        lights = []
+    _lights_camera_name = cam_obj.name if cam_obj is not None else None
+    if not _needs_lights:
+        # No physical camera has ghosts or diffraction enabled
+        lights, key, animated = [], (), False
+    elif cam_obj is None or not _is_using_physical_lens(cam_obj.data):
+        lights, key, animated = [], (), False
     elif not (cam_obj.data.physical_camera.lens_ghosts
               or cam_obj.data.physical_camera.diffraction):
-        lights = []
+        lights, key, animated = [], (), False
     else:
-        lights = scene_lights.collect_lights(scene)
+        lights, key, animated = scene_lights.collect_lights(scene)
+    _lights_animated = animated
 
-    key = _lights_key(lights)
     if key == _cached_light_key:
         return
     _cached_light_key = key
 
-    _osl_source = codegen.inject_scene_lights(_osl_source_base, lights)
+    _current_lights = lights
+    _current_lights_key = key
     _updating_lights = True
     try:
-        text = _get_or_create_text_block()
-        for cam in bpy.data.cameras:
-            if _is_using_physical_lens(cam):
-                cam.custom_shader = text
-                sync_to_cycles(cam)
+        built = {}
+        for cam in _iter_physical_cams():
+            _build_camera_shader(cam, built)
     finally:
         _updating_lights = False
 
 
 @persistent
 def _on_load_post(_):
-    """Update the shader text block and reassign to cameras after file load."""
+    """Update the shader text blocks and reassign to cameras after file load."""
     global _cached_light_key
     _cached_light_key = None
-    if _TEXT_BLOCK_NAME not in bpy.data.texts:
+    # Queued names refer to the previous file's cameras
+    if bpy.app.timers.is_registered(_flush_rebuilds):
+        bpy.app.timers.unregister(_flush_rebuilds)
+    _pending_rebuilds.clear()
+    _forget_text_blocks()
+    _refresh_active_flags()
+    _refresh_lens_index_cache()
+    if _physical_cams:
+        _ensure_handlers_attached()
+    else:
+        _detach_handlers_if_idle()
+    if not _physical_cams or bpy.context.scene is None:
         return
     _update_scene_lights(bpy.context.scene)
 
 
+@persistent
+def _on_undo_redo(*_):
+    """Undo/redo may restore older text blocks and camera states.
+
+    Rewrite the text blocks on next use and rebuild _physical_cams, since
+    the step may have enabled or disabled the physical lens on a camera.
+    The light key is reset and a light update scheduled as well, so restored
+    texts are rewritten even if the lights themselves are unchanged.
+    """
+    global _cached_light_key
+    _cached_light_key = None
+    _forget_text_blocks()
+    _refresh_physical_cams()
+    if _physical_cams:
+        _ensure_handlers_attached()
+        _schedule_light_update(0.0)
+    else:
+        _detach_handlers_if_idle()
+
+
 @persistent
 def _on_render_pre(_):
     """Inject scene light positions into the shader before each frame."""
+    # Full rescan so renders also pick up cameras that gained the shader
+    # without going through the operator (e.g. duplicated cameras). This
+    # handler stays attached for that reason; it attaches the others.
+    _refresh_physical_cams()
+    if _physical_cams:
+        _ensure_handlers_attached()
     _update_scene_lights(bpy.context.scene)
 
 
 @persistent
 def _on_depsgraph_update(scene, depsgraph):
     """Re-inject scene lights when lights or emissive meshes change."""
-    if _updating_lights:
+    # Without a camera that uses ghosts or diffraction, light edits can't
+    # change any shader; skip scanning the updates entirely.
+    if _updating_lights or not _needs_lights:
         return
 
     needs_update = False
     for update in depsgraph.updates:
         uid = update.id
-        if isinstance(uid, bpy.types.Object):
-            if uid.type == 'LIGHT' and (update.is_updated_transform
-                                        or update.is_updated_shading):
-                needs_update = True
-                break
-            if uid.type == 'MESH' and (update.is_updated_transform
-                                       or update.is_updated_shading):
+        if isinstance(uid, _OBJECT_TYPE):
+            if uid.type in _LIGHT_OBJECT_TYPES and (update.is_updated_transform
+                                                    or update.is_updated_shading):
                 needs_update = True
                 break
-        elif isinstance(uid, bpy.types.Light):
-            needs_update = True
-            break
-        elif isinstance(uid, bpy.types.Material):
+        elif isinstance(uid, _LIGHT_DATA_TYPES):
             needs_update = True
             break
 
     if needs_update:
-        _update_scene_lights(scene)
+        # Debounce: re-arm the timer on every event so a burst of updates
+        # (e.g. dragging a light) collapses into one rebuild at the end.
+        _schedule_light_update(_LIGHT_UPDATE_DELAY)
+
+
+def _schedule_light_update(delay):
+    """(Re)arm the timer that applies a scene light update after delay seconds."""
+    if bpy.app.timers.is_registered(_flush_light_update):
+        bpy.app.timers.unregister(_flush_light_update)
+    bpy.app.timers.register(_flush_light_update, first_interval=delay)
+
+
+def _flush_light_update():
+    """Timer callback that applies a debounced scene light update."""
+    if bpy.context.scene is not None:
+        _update_scene_lights(bpy.context.scene)
+    return None
 
 
 @persistent
 def _on_frame_change(scene, depsgraph):
     """Update lights on frame change for animated lights."""
-    _update_scene_lights(scene)
+    # Markers can also switch the scene camera to one with other settings
+    cam_obj = scene.camera
+    cam_name = cam_obj.name if cam_obj is not None else None
+    if _lights_animated or cam_name != _lights_camera_name:
+        _update_scene_lights(scene)
+
+
+def _scene_handlers():
+    """Handlers that only do work while a camera uses the physical lens."""
+    handlers = bpy.app.handlers
+    return (
+        (handlers.depsgraph_update_post, _on_depsgraph_update),
+        (handlers.frame_change_post, _on_frame_change),
+    )
+
+
+def _ensure_handlers_attached():
+    for handler_list, fn in _scene_handlers():
+        if fn not in handler_list:
+            handler_list.append(fn)
+
+
+def _detach_handlers_if_idle():
+    if _physical_cams:
+        return
+    for handler_list, fn in _scene_handlers():
+        if fn in handler_list:
+            handler_list.remove(fn)
+
+
+def _on_registered():
+    """Pick up physical cameras in the already-open file after enabling."""
+    _on_load_post(None)
+    return None
 
 
 def register():
-    global _lens_registry, _lens_items, _lens_index_map, _osl_source
-    global _osl_source_base
+    global _lens_registry, _lens_items, _lens_index_map, _lens_osl_base
+    global _lens_text_names, _lens_max_fstop, _lens_focal_length
 
     addon_dir = Path(__file__).parent
     template_path = addon_dir / "lens_camera.osl.template"
     lens_dir = addon_dir / "lenses"
 
-    osl_source_base, lenses = codegen.generate_osl(template_path, lens_dir)
-    _osl_source_base = osl_source_base
-    _osl_source = codegen.inject_scene_lights(_osl_source_base)
+    osl_sources, lenses = codegen.generate_osl(template_path, lens_dir)
+    _lens_osl_base = tuple(osl_sources)
+    _lens_text_names = tuple(
+        f"{_TEXT_BLOCK_PREFIX}: {lens['filename_stem']}" for lens in lenses
+    )
     _lens_registry = lenses
-    _lens_items = [
+    _lens_max_fstop = tuple(lens["max_fstop"] for lens in lenses)
+    _lens_focal_length = tuple(lens["focal_length"] for lens in lenses)
+    _lens_items = tuple(
         (lens["filename_stem"], lens["name"], "") for lens in lenses
-    ]
+    )
     _lens_index_map = {
         lens["filename_stem"]: i for i, lens in enumerate(lenses)
     }
@@ -438,7 +742,7 @@ def register():
     PhysicalCameraProperties.__annotations__["lens"] = EnumProperty(
         name="Lens",
         items=_lens_items,
-        update=_on_lens_change,
+        update=_on_property_change,
     )
 
     diagram.load_previews(_lens_registry)
@@ -451,16 +755,32 @@ def register():
     )
     bpy.types.OUTLINER_MT_object.append(_draw_object_context_menu)
     bpy.app.handlers.load_post.append(_on_load_post)
+    bpy.app.handlers.undo_post.append(_on_undo_redo)
+    bpy.app.handlers.redo_post.append(_on_undo_redo)
     bpy.app.handlers.render_pre.append(_on_render_pre)
-    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
-    bpy.app.handlers.frame_change_post.append(_on_frame_change)
+    # The other scene handlers are attached by _on_load_post (run from a
+    # timer here, since bpy.data isn't available during register), the
+    # enable operator or _on_render_pre, and only while at least one camera
+    # uses the physical lens.
+    bpy.app.timers.register(_on_registered, first_interval=0.0)
 
 
 def unregister():
+    if bpy.app.timers.is_registered(_flush_light_update):
+        bpy.app.timers.unregister(_flush_light_update)
+    if bpy.app.timers.is_registered(_flush_rebuilds):
+        bpy.app.timers.unregister(_flush_rebuilds)
+    _pending_rebuilds.clear()
+    if bpy.app.timers.is_registered(_on_registered):
+        bpy.app.timers.unregister(_on_registered)
     diagram.cleanup()
-    bpy.app.handlers.frame_change_post.remove(_on_frame_change)
-    bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    _forget_text_blocks()
+    _physical_cams.clear()
+    _refresh_needs_lights()
+    _detach_handlers_if_idle()
     bpy.app.handlers.render_pre.remove(_on_render_pre)
+    bpy.app.handlers.redo_post.remove(_on_undo_redo)
+    bpy.app.handlers.undo_post.remove(_on_undo_redo)
     bpy.app.handlers.load_post.remove(_on_load_post)
     bpy.types.OUTLINER_MT_object.remove(_draw_object_context_menu)
     del bpy.types.Camera.physical_camera
@@ -8,6 +8,28 @@ N_EXTRA = 8
 
 _COATING_VALUES = {"none": 0.0, "single": 1.0, "multi": 2.0}
 _TYPE_VALUES = {"spherical": 0, "flat": 1, "stop": 2, "aspheric": 3, "cylindrical_x": 4, "cylindrical_y": 5}
+_LENS_DATA_MARKER = "// {{LENS_DATA}}"
+_SCENE_LIGHTS_MARKER = "// {{SCENE_LIGHTS}}"
+
+
+# OSL assignment lines for one surface, %-formatted: a single format parse
+# per line instead of one per f-string field
+_SURFACE_FMT = (
+    "    radii%-4s = %8s;  thicknesses%-4s = %6s;  iors%-4s = %s;  "
+    "apertures%-4s = %s;  abbe_v%-4s = %s;\n"
+)
+_CLOSE_FMT = "    thicknesses_close[%d] = %s;\n"
+_TYPE_FMT = "    surface_types[%d] = %d;\n"
+_EXTRA_FMT = (
+    "    extra[%d] = %s;  extra[%d] = %s;  extra[%d] = %s;  extra[%d] = %s;  "
+    "extra[%d] = %s;\n"
+)
+# extra[] is zeroed up front so only surfaces with a nonzero conic or
+# aspheric coefficient need assignments
+_EXTRA_ZERO = (
+    "    for (int i = 0; i < MAX_EXTRA; i++)\n"
+    "        extra[i] = 0.0;\n"
+)
 
 
 def _format_surface_assignments(
@@ -20,137 +42,152 @@ def _format_surface_assignments(
         for v in focus["variables"]:
             close_thicknesses[v["surface"]] = v["thickness_close"]
 
-    lines = []
-    for i, s in enumerate(surfaces):
-        idx = f"[{i}]"
-        lines.append(
-            f"        radii{idx:<4} = {s['radius']:>8};  "
-            f"thicknesses{idx:<4} = {s['thickness']:>6};  "
-            f"iors{idx:<4} = {s['ior']};  "
-            f"apertures{idx:<4} = {s['aperture']};  "
-            f"abbe_v{idx:<4} = {s['abbe_v']};"
-        )
-    lines.append("")
-    for i, s in enumerate(surfaces):
-        close_val = close_thicknesses.get(i, s["thickness"])
-        lines.append(f"        thicknesses_close[{i}] = {close_val};")
-    lines.append("")
-    for i, st in enumerate(surface_types):
-        lines.append(
-            f"        surface_types[{i}] = {_TYPE_VALUES[st]};"
+    # One pass over the surfaces, filling each section's lines in order
+    rows, close_rows, type_rows = [], [], []
+    extra_rows = [_EXTRA_ZERO]
+    for i, (s, st) in enumerate(zip(surfaces, surface_types)):
+        idx = "[%d]" % i
+        rows.append(_SURFACE_FMT % (
+            idx, s["radius"], idx, s["thickness"], idx, s["ior"],
+            idx, s["aperture"], idx, s["abbe_v"],
+        ))
+        close_rows.append(
+            _CLOSE_FMT % (i, close_thicknesses.get(i, s["thickness"]))
         )
-    lines.append("")
-    for i, s in enumerate(surfaces):
-        base = i * N_EXTRA
+        type_rows.append(_TYPE_FMT % (i, _TYPE_VALUES[st]))
+        # load_lenses() only allows conic/aspheric_coeffs on aspheric surfaces
+        if st != "aspheric":
+            continue
         k = s.get("conic", 0.0)
-        coeffs = s.get("aspheric_coeffs", [0.0, 0.0, 0.0])
+        coeffs = s["aspheric_coeffs"]
         a10 = coeffs[3] if len(coeffs) >= 4 else 0.0
-        lines.append(
-            f"        extra[{base}] = {k};  "
-            f"extra[{base + 1}] = {coeffs[0]};  "
-            f"extra[{base + 2}] = {coeffs[1]};  "
-            f"extra[{base + 3}] = {coeffs[2]};"
-        )
-        lines.append(
-            f"        extra[{base + 4}] = {a10};  "
-            f"extra[{base + 5}] = 0.0;  "
-            f"extra[{base + 6}] = 0.0;  "
-            f"extra[{base + 7}] = 0.0;"
-        )
-    return "\n".join(lines)
-
-
-def _generate_load_lens_data(lenses: list[dict]) -> str:
-    """Generate the #define and load_lens_data() function."""
-    max_extra = MAX_SURFACES * N_EXTRA
-    lines = [
-        f"#define MAX_SURFACES {MAX_SURFACES}",
-        f"#define N_EXTRA {N_EXTRA}",
-        f"#define MAX_EXTRA {max_extra}",
-        "",
-        "#define SURFACE_SPHERICAL     0",
-        "#define SURFACE_FLAT          1",
-        "#define SURFACE_STOP          2",
-        "#define SURFACE_ASPHERIC      3",
-        "#define SURFACE_CYLINDRICAL_X 4",
-        "#define SURFACE_CYLINDRICAL_Y 5",
-        "",
-        "// extra[i*N_EXTRA + 0] = k (conic constant)",
-        "// extra[i*N_EXTRA + 1] = A4 (4th-order aspheric coefficient)",
-        "// extra[i*N_EXTRA + 2] = A6 (6th-order aspheric coefficient)",
-        "// extra[i*N_EXTRA + 3] = A8 (8th-order aspheric coefficient)",
-        "// extra[i*N_EXTRA + 4] = A10 (10th-order aspheric coefficient)",
-        "// extra[i*N_EXTRA + 5..7] = reserved",
-        "",
-        "void load_lens_data(",
-        "    int lens_type,",
-        "    output float radii[MAX_SURFACES],",
-        "    output float thicknesses[MAX_SURFACES],",
-        "    output float iors[MAX_SURFACES],",
-        "    output float apertures[MAX_SURFACES],",
-        "    output float abbe_v[MAX_SURFACES],",
-        "    output int surface_types[MAX_SURFACES],",
-        "    output float extra[MAX_EXTRA],",
-        "    output float thicknesses_close[MAX_SURFACES],",
-        "    output float focus_close_distance,",
-        "    output int num_surfaces,",
-        "    output float coating,",
-        "    output float squeeze)",
-        "{",
-    ]
-
-    for i, lens in enumerate(lenses):
-        keyword = "if" if i == 0 else "else if"
-        coating_val = _COATING_VALUES[lens["coating"]]
-        focus = lens.get("focus")
-        close_dist = focus["close_distance"] if focus else 0.0
-        lines.append(f"    {keyword} (lens_type == {i}) {{")
-        lines.append(f"        // {lens['name']}")
-        lines.append(f"        num_surfaces = {len(lens['surfaces'])};")
-        lines.append(f"        coating = {coating_val};")
-        lines.append(f"        squeeze = {float(lens['squeeze'])};")
-        lines.append(f"        focus_close_distance = {close_dist};")
-        lines.append(_format_surface_assignments(
-            lens["surfaces"], lens["surface_types"], focus
+        if k == 0.0 and a10 == 0.0 and not any(coeffs[:3]):
+            continue
+        base = i * N_EXTRA
+        extra_rows.append(_EXTRA_FMT % (
+            base, k, base + 1, coeffs[0], base + 2, coeffs[1],
+            base + 3, coeffs[2], base + 4, a10,
         ))
-        lines.append("    }")
-
-    default = lenses[0]
-    default_coating = _COATING_VALUES[default["coating"]]
-    default_focus = default.get("focus")
-    default_close_dist = default_focus["close_distance"] if default_focus else 0.0
-    lines.append("    else {")
-    lines.append(f"        // Fallback to {default['name']}")
-    lines.append(f"        num_surfaces = {len(default['surfaces'])};")
-    lines.append(f"        coating = {default_coating};")
-    lines.append(f"        squeeze = {float(default['squeeze'])};")
-    lines.append(f"        focus_close_distance = {default_close_dist};")
-    lines.append(_format_surface_assignments(
-        default["surfaces"], default["surface_types"], default_focus
+    parts = rows + ["\n"] + close_rows + ["\n"] + type_rows + ["\n"] + extra_rows
+    return "".join(parts)
+
+
+# Everything in the lens data block that doesn't depend on the lens
+_LENS_DATA_PREAMBLE = f"""\
+#define MAX_SURFACES {MAX_SURFACES}
+#define N_EXTRA {N_EXTRA}
+#define MAX_EXTRA {MAX_SURFACES * N_EXTRA}
+
+#define SURFACE_SPHERICAL     0
+#define SURFACE_FLAT          1
+#define SURFACE_STOP          2
+#define SURFACE_ASPHERIC      3
+#define SURFACE_CYLINDRICAL_X 4
+#define SURFACE_CYLINDRICAL_Y 5
+
+// extra[i*N_EXTRA + 0] = k (conic constant)
+// extra[i*N_EXTRA + 1] = A4 (4th-order aspheric coefficient)
+// extra[i*N_EXTRA + 2] = A6 (6th-order aspheric coefficient)
+// extra[i*N_EXTRA + 3] = A8 (8th-order aspheric coefficient)
+// extra[i*N_EXTRA + 4] = A10 (10th-order aspheric coefficient)
+// extra[i*N_EXTRA + 5..7] = reserved
+
+void load_lens_data(
+    output float radii[MAX_SURFACES],
+    output float thicknesses[MAX_SURFACES],
+    output float iors[MAX_SURFACES],
+    output float apertures[MAX_SURFACES],
+    output float abbe_v[MAX_SURFACES],
+    output int surface_types[MAX_SURFACES],
+    output float extra[MAX_EXTRA],
+    output float thicknesses_close[MAX_SURFACES],
+    output float focus_close_distance,
+    output int num_surfaces,
+    output float coating,
+    output float squeeze)
+{{
+"""
+_LENS_SCALARS_FMT = (
+    "    // %s\n"
+    "    num_surfaces = %d;\n"
+    "    coating = %s;\n"
+    "    squeeze = %s;\n"
+    "    focus_close_distance = %s;\n"
+)
+
+
+def _generate_load_lens_data(lens: dict) -> str:
+    """Generate the #define and a branchless load_lens_data() for one lens."""
+    focus = lens.get("focus")
+    close_dist = focus["close_distance"] if focus else 0.0
+    return "".join((
+        _LENS_DATA_PREAMBLE,
+        _LENS_SCALARS_FMT % (
+            lens["name"], len(lens["surfaces"]),
+            _COATING_VALUES[lens["coating"]], float(lens["squeeze"]),
+            close_dist,
+        ),
+        _format_surface_assignments(
+            lens["surfaces"], lens["surface_types"], focus
+        ),
+        "}",
     ))
-    lines.append("    }")
-
-    lines.append("}")
-    return "\n".join(lines)
 
 
 def generate_osl(
     template_path: Path, lens_dir: Path
-) -> tuple[str, list[dict]]:
-    """Generate OSL source from template + TOML lenses. Returns (source, lenses)."""
+) -> tuple[list[tuple[str, str]], list[dict]]:
+    """Generate one OSL source per lens from template + TOML lenses.
+
+    Each source only contains its own lens's load_lens_data(), so the OSL
+    compiler can constant-fold the prescription. Returns (sources, lenses),
+    with sources indexed like lenses. Each source is kept as the
+    (before, after) halves around the scene lights placeholder, ready for
+    inject_scene_lights().
+    """
     lenses = load_lenses(lens_dir)
     if not lenses:
         raise ValueError(f"No .toml lens files found in {lens_dir}")
 
+    # Split the template once; each source is then built by concatenation
     template = template_path.read_text()
-    lens_data_block = _generate_load_lens_data(lenses)
-    osl_source = template.replace("// {{LENS_DATA}}", lens_data_block)
+    head, marker, rest = template.partition(_LENS_DATA_MARKER)
+    if not marker:
+        raise ValueError(f"{template_path} has no {_LENS_DATA_MARKER} placeholder")
+    mid, marker, tail = rest.partition(_SCENE_LIGHTS_MARKER)
+    if not marker:
+        raise ValueError(
+            f"{template_path} has no {_SCENE_LIGHTS_MARKER} placeholder "
+            f"after {_LENS_DATA_MARKER}"
+        )
+
+    osl_sources = []
+    for lens in lenses:
+        osl_sources.append((head + _generate_load_lens_data(lens) + mid, tail))
+
+    return osl_sources, lenses
+
+
+# (lights_key, block) of the last load_scene_lights() block generated with a key
+_lights_block_cache: tuple[tuple | None, str] = (None, "")
+
 
-    return osl_source, lenses
+def inject_scene_lights(osl_source, lights=None, lights_key=None):
+    """Join a generate_osl() source around a generated light loader function.
 
+    osl_source is the (before, after) pair the // {{SCENE_LIGHTS}}
+    placeholder was split into.
 
-def inject_scene_lights(osl_source, lights=None):
-    """Replace // {{SCENE_LIGHTS}} with generated light loader function."""
+    When lights_key is given, the generated block is reused for later calls
+    with an equal key, so injecting the same lights into several lens
+    sources only generates it once.
+    """
+    global _lights_block_cache
     from .scene_lights import generate_load_scene_lights
-    block = generate_load_scene_lights(lights or [])
-    return osl_source.replace("// {{SCENE_LIGHTS}}", block)
+    cached_key, block = _lights_block_cache
+    if lights_key is None or lights_key != cached_key:
+        block = generate_load_scene_lights(lights or [])
+        if lights_key is not None:
+            _lights_block_cache = (lights_key, block)
+    before, after = osl_source
+    return before + block + after
@@ -5,38 +5,54 @@ from pathlib import Path
 import bpy.utils.previews
 
 _preview_collection = None
+# filename_stem -> PNG path, for diagrams not loaded into the collection yet
+_pending_paths: dict[str, Path] = {}
+# filename_stem -> icon_id of loaded diagrams, so panel redraws don't query
+# the preview collection
+_icon_ids: dict[str, int] = {}
 
 
 def load_previews(lenses):
-    """Load pre-rendered PNG diagrams into a preview collection."""
-    global _preview_collection
+    """Find the pre-rendered PNG diagrams; each is loaded on first use."""
     cleanup()
-    _preview_collection = bpy.utils.previews.new()
     previews_dir = Path(__file__).parent / "previews"
     for lens in lenses:
         stem = lens['filename_stem']
         png_path = previews_dir / f"{stem}.png"
         if png_path.exists():
-            _preview_collection.load(stem, str(png_path), 'IMAGE')
+            _pending_paths[stem] = png_path
 
 
 def has_previews():
-    """Return whether any diagram previews are loaded."""
-    return _preview_collection is not None and len(_preview_collection) > 0
+    """Return whether any diagram previews are available."""
+    return bool(_icon_ids or _pending_paths)
 
 
 def get_icon_id(filename_stem):
-    """Return the preview icon_id for a given lens filename stem, or 0."""
-    if _preview_collection is None:
+    """Return the preview icon_id for a given lens filename stem, or 0.
+
+    Loads the lens's diagram into the preview collection the first time it
+    is asked for.
+    """
+    global _preview_collection
+    icon_id = _icon_ids.get(filename_stem)
+    if icon_id is not None:
+        return icon_id
+    png_path = _pending_paths.pop(filename_stem, None)
+    if png_path is None:
         return 0
-    if filename_stem in _preview_collection:
-        return _preview_collection[filename_stem].icon_id
-    return 0
+    if _preview_collection is None:
+        _preview_collection = bpy.utils.previews.new()
+    preview = _preview_collection.load(filename_stem, str(png_path), 'IMAGE')
+    _icon_ids[filename_stem] = preview.icon_id
+    return preview.icon_id
 
 
 def cleanup():
     """Remove the preview collection."""
     global _preview_collection
+    _pending_paths.clear()
+    _icon_ids.clear()
     if _preview_collection is not None:
         bpy.utils.previews.remove(_preview_collection)
         _preview_collection = None
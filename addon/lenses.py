@@ -4,28 +4,78 @@ import tomllib
 from pathlib import Path
 
 MAX_SURFACES = 36
-VALID_SURFACE_TYPES = ("spherical", "flat", "stop", "aspheric", "cylindrical_x", "cylindrical_y")
+_SURFACE_TYPE_NAMES = ("spherical", "flat", "stop", "aspheric", "cylindrical_x", "cylindrical_y")
+VALID_SURFACE_TYPES = frozenset(_SURFACE_TYPE_NAMES)
+_COATING_NAMES = ("none", "single", "multi")
+_VALID_COATINGS = frozenset(_COATING_NAMES)
 
 
 def _resolve_surface_types(surfaces: list[dict], filename: str) -> list[str]:
     """Resolve the type for each surface from explicit or inferred values."""
     types = []
-    for i, s in enumerate(surfaces):
+    for s in surfaces:
         explicit = s.get("type")
-        if explicit is not None:
-            if explicit not in VALID_SURFACE_TYPES:
+        if explicit is None:
+            explicit = "flat" if s["radius"] == 0 else "spherical"
+        types.append(explicit)
+    try:
+        valid = VALID_SURFACE_TYPES.issuperset(types)
+    except TypeError:  # an unhashable value, e.g. a TOML array
+        valid = False
+    if not valid:
+        for i, explicit in enumerate(types):
+            if explicit not in _SURFACE_TYPE_NAMES:
                 raise ValueError(
                     f"{filename}: surface {i} type {explicit!r} must be one "
-                    f"of {VALID_SURFACE_TYPES}"
+                    f"of {_SURFACE_TYPE_NAMES}"
                 )
-            types.append(explicit)
-        elif s["radius"] == 0:
-            types.append("flat")
-        else:
-            types.append("spherical")
     return types
 
 
+def _validate_aspheric(s: dict, i: int, filename: str) -> None:
+    if s["radius"] == 0:
+        raise ValueError(
+            f"{filename}: aspheric surface {i} must have nonzero radius"
+        )
+    coeffs = s.get("aspheric_coeffs")
+    if not isinstance(coeffs, list) or len(coeffs) not in (3, 4):
+        raise ValueError(
+            f"{filename}: aspheric surface {i} must have "
+            f"aspheric_coeffs as a list of 3 or 4 floats"
+        )
+
+
+def _validate_cylindrical(s: dict, i: int, filename: str) -> None:
+    if s["radius"] == 0:
+        raise ValueError(
+            f"{filename}: cylindrical surface {i} must have nonzero radius"
+        )
+    if "aspheric_coeffs" in s or "conic" in s:
+        raise ValueError(
+            f"{filename}: cylindrical surface {i} must "
+            f"not have aspheric_coeffs or conic"
+        )
+
+
+def _validate_plain(s: dict, i: int, filename: str) -> None:
+    if "aspheric_coeffs" in s or "conic" in s:
+        raise ValueError(
+            f"{filename}: non-aspheric surface {i} must "
+            f"not have aspheric_coeffs or conic"
+        )
+
+
+# Per-type check of a surface's fields, keyed by resolved surface type
+_SURFACE_VALIDATORS = {
+    "spherical": _validate_plain,
+    "flat": _validate_plain,
+    "stop": _validate_plain,
+    "aspheric": _validate_aspheric,
+    "cylindrical_x": _validate_cylindrical,
+    "cylindrical_y": _validate_cylindrical,
+}
+
+
 def _parse_focus(data: dict, surfaces: list[dict], filename: str) -> dict | None:
     """Parse optional [focus] section from lens TOML data."""
     focus_raw = data.get("focus")
@@ -72,80 +122,72 @@ def _parse_focus(data: dict, surfaces: list[dict], filename: str) -> dict | None
     return {"close_distance": close_distance, "variables": variables}
 
 
+# Parsed lens per TOML path, with the (st_mtime_ns, st_size) it was read at,
+# so repeated load_lenses() calls only re-parse files that changed
+_lens_cache: dict[Path, tuple[int, int, dict]] = {}
+
+
 def load_lenses(lens_dir: Path) -> list[dict]:
     """Read all .toml lens files from lens_dir, sorted by filename."""
     lenses = []
     for toml_path in sorted(lens_dir.glob("*.toml")):
-        with open(toml_path, "rb") as f:
-            data = tomllib.load(f)
-        lens = data["lens"]
-        surfaces = data["surface"]
-        if len(surfaces) > MAX_SURFACES:
-            raise ValueError(
-                f"{toml_path.name}: {len(surfaces)} surfaces exceeds "
-                f"MAX_SURFACES ({MAX_SURFACES})"
-            )
-        coating = lens.get("coating", "none")
-        valid_coatings = ("none", "single", "multi")
-        if coating not in valid_coatings:
-            raise ValueError(
-                f"{toml_path.name}: coating {coating!r} must be one of "
-                f"{valid_coatings}"
-            )
-        squeeze = lens.get("squeeze", 1.0)
-        if not isinstance(squeeze, (int, float)) or squeeze <= 0:
-            raise ValueError(
-                f"{toml_path.name}: squeeze {squeeze!r} must be a positive number"
-            )
-        surface_types = _resolve_surface_types(surfaces, toml_path.name)
-        for i, (s, st) in enumerate(zip(surfaces, surface_types)):
-            if st == "aspheric":
-                if s["radius"] == 0:
-                    raise ValueError(
-                        f"{toml_path.name}: aspheric surface {i} must have "
-                        f"nonzero radius"
-                    )
-                coeffs = s.get("aspheric_coeffs")
-                if not isinstance(coeffs, list) or len(coeffs) not in (3, 4):
-                    raise ValueError(
-                        f"{toml_path.name}: aspheric surface {i} must have "
-                        f"aspheric_coeffs as a list of 3 or 4 floats"
-                    )
-            elif st in ("cylindrical_x", "cylindrical_y"):
-                if s["radius"] == 0:
-                    raise ValueError(
-                        f"{toml_path.name}: cylindrical surface {i} must have "
-                        f"nonzero radius"
-                    )
-                if "aspheric_coeffs" in s or "conic" in s:
-                    raise ValueError(
-                        f"{toml_path.name}: cylindrical surface {i} must "
-                        f"not have aspheric_coeffs or conic"
-                    )
-            else:
-                if "aspheric_coeffs" in s or "conic" in s:
-                    raise ValueError(
-                        f"{toml_path.name}: non-aspheric surface {i} must "
-                        f"not have aspheric_coeffs or conic"
-                    )
-        stop_count = surface_types.count("stop")
-        if stop_count != 1:
-            raise ValueError(
-                f"{toml_path.name}: expected exactly 1 stop surface, "
-                f"found {stop_count}"
-            )
-        stop_index = surface_types.index("stop")
-        focus = _parse_focus(data, surfaces, toml_path.name)
-        lenses.append({
-            "name": lens["name"],
-            "filename_stem": toml_path.stem,
-            "focal_length": lens["focal_length"],
-            "max_fstop": lens["max_fstop"],
-            "stop_index": stop_index,
-            "coating": coating,
-            "squeeze": squeeze,
-            "surfaces": surfaces,
-            "surface_types": surface_types,
-            "focus": focus,
-        })
+        st = toml_path.stat()
+        cached = _lens_cache.get(toml_path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            lenses.append(cached[2])
+            continue
+        lens = _load_lens(toml_path)
+        _lens_cache[toml_path] = (st.st_mtime_ns, st.st_size, lens)
+        lenses.append(lens)
     return lenses
+
+
+def _parse_toml(toml_path: Path) -> dict:
+    """Parse a TOML file, reading it whole so the parser works from memory."""
+    return tomllib.loads(toml_path.read_bytes().decode("utf-8"))
+
+
+def _load_lens(toml_path: Path) -> dict:
+    """Parse and validate one lens TOML file."""
+    data = _parse_toml(toml_path)
+    lens = data["lens"]
+    surfaces = data["surface"]
+    if len(surfaces) > MAX_SURFACES:
+        raise ValueError(
+            f"{toml_path.name}: {len(surfaces)} surfaces exceeds "
+            f"MAX_SURFACES ({MAX_SURFACES})"
+        )
+    coating = lens.get("coating", "none")
+    if coating not in _VALID_COATINGS:
+        raise ValueError(
+            f"{toml_path.name}: coating {coating!r} must be one of "
+            f"{_COATING_NAMES}"
+        )
+    squeeze = lens.get("squeeze", 1.0)
+    if not isinstance(squeeze, (int, float)) or squeeze <= 0:
+        raise ValueError(
+            f"{toml_path.name}: squeeze {squeeze!r} must be a positive number"
+        )
+    surface_types = _resolve_surface_types(surfaces, toml_path.name)
+    for i, (s, st) in enumerate(zip(surfaces, surface_types)):
+        _SURFACE_VALIDATORS[st](s, i, toml_path.name)
+    stop_count = surface_types.count("stop")
+    if stop_count != 1:
+        raise ValueError(
+            f"{toml_path.name}: expected exactly 1 stop surface, "
+            f"found {stop_count}"
+        )
+    stop_index = surface_types.index("stop")
+    focus = _parse_focus(data, surfaces, toml_path.name)
+    return {
+        "name": lens["name"],
+        "filename_stem": toml_path.stem,
+        "focal_length": lens["focal_length"],
+        "max_fstop": lens["max_fstop"],
+        "stop_index": stop_index,
+        "coating": coating,
+        "squeeze": squeeze,
+        "surfaces": surfaces,
+        "surface_types": surface_types,
+        "focus": focus,
+    }
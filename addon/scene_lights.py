@@ -5,46 +5,123 @@ transforms them to camera space at render time via transform("world",
 "camera", P), so camera movement does not trigger shader recompilation.
 """
 
+import heapq
+from collections import namedtuple
+from operator import attrgetter
+
 MAX_LIGHTS = 16
 
+# type: 0=positional, 1=sun; pos: world meters; dir: world-space toward-source
+# for suns; radius: mm. Being a tuple, a list of these compares and hashes
+# directly, so it doubles as the cache key for the collected lights.
+SceneLight = namedtuple("SceneLight", "type pos dir intensity radius")
+
+# OSL assignments for one light, formatted with the SceneLight as lt
+_LIGHT_FMT = (
+    "    light_types[{i}] = {lt.type};\n"
+    "    light_pos[{i3}] = {lt.pos[0]};  "
+    "light_pos[{i3_1}] = {lt.pos[1]};  "
+    "light_pos[{i3_2}] = {lt.pos[2]};\n"
+    "    light_dir[{i3}] = {lt.dir[0]};  "
+    "light_dir[{i3_1}] = {lt.dir[1]};  "
+    "light_dir[{i3_2}] = {lt.dir[2]};\n"
+    "    light_intensity[{i}] = {lt.intensity};\n"
+    "    light_radius[{i}] = {lt.radius};\n"
+)
+
+# Rec. 709 luminance weights, for light intensity from an RGB color
+_LUM_R, _LUM_G, _LUM_B = 0.2126, 0.7152, 0.0722
+
+# Key for picking the MAX_LIGHTS brightest lights
+_intensity = attrgetter("intensity")
+
 
 def collect_lights(scene):
     """Collect lights from the scene in world space.
 
     Finds both Blender LIGHT objects and mesh objects with emissive
-    materials (Emission shader or Principled BSDF with emission).
+    materials (Emission shader or Principled BSDF with emission). Objects
+    disabled in renders are skipped, since they contribute no light there.
 
-    Returns a list of dicts with keys: type (0=positional, 1=sun),
-    pos (world meters), dir (world-space toward-source for suns),
-    intensity, radius (mm).
+    Returns (lights, key, animated): a list of SceneLight, brightest first,
+    a hashable key that compares equal when the collected lights are the
+    same, and whether any light source may change from frame to frame.
     """
     lights = []
+    animated = False
+    # Emission per material pointer, for materials shared between meshes
+    material_cache = {}
 
     for obj in scene.objects:
-        if obj.type == 'LIGHT' and obj.visible_camera:
-            _collect_light_object(obj, lights)
+        if obj.hide_render:
+            # Skipped before any transform or material access; keyed
+            # render visibility can still bring it back on another frame
+            animated = animated or obj.animation_data is not None
+            continue
+        if obj.type == 'LIGHT':
+            # Camera visibility can be keyed too, so hidden lights still count
+            if obj.visible_camera:
+                _collect_light_object(obj, lights)
+            animated = animated or _is_animated(obj, obj.data)
         elif obj.type == 'MESH':
-            _collect_emissive_mesh(obj, lights)
+            emits = _collect_emissive_mesh(obj, lights, material_cache)
+            if not animated:
+                materials = [slot.material for slot in obj.material_slots]
+                # Animated materials may bring a dark mesh's emission up,
+                # so they count even when the mesh doesn't emit yet
+                if emits:
+                    animated = _is_animated(obj, *materials)
+                else:
+                    animated = _has_animation(*materials)
 
-    lights.sort(key=lambda l: l["intensity"], reverse=True)
-    return lights[:MAX_LIGHTS]
+    lights = heapq.nlargest(MAX_LIGHTS, lights, key=_intensity)
+    return lights, tuple(lights), animated
+
+
+def _is_animated(obj, *data):
+    """Whether obj's transform or any of data may be animated or driven.
+
+    Conservative: any animation data, parent or constraint counts, since
+    each can move the object or change its emission between frames.
+    """
+    if obj.animation_data is not None or obj.parent is not None:
+        return True
+    if len(obj.constraints):
+        return True
+    return _has_animation(*data)
+
+
+def _has_animation(*data):
+    """Whether any of data (or its node tree) has animation data."""
+    for datablock in data:
+        if datablock is None:
+            continue
+        if datablock.animation_data is not None:
+            return True
+        node_tree = getattr(datablock, "node_tree", None)
+        if node_tree is not None and node_tree.animation_data is not None:
+            return True
+    return False
 
 
 def _collect_light_object(obj, lights):
     light = obj.data
+    color = light.color
+    intensity = light.energy * (
+        _LUM_R * color[0] + _LUM_G * color[1] + _LUM_B * color[2])
 
     if light.type == 'SUN':
-        from mathutils import Vector
-        emission_dir = obj.matrix_world.to_3x3() @ Vector((0, 0, -1))
-        # Negate to get "toward source" direction.
+        # A sun emits along its local -Z, so the "toward source" direction
+        # is the world matrix's Z column; no need to multiply (0, 0, -1).
         # Stored in world space; the shader transforms to camera space.
-        lights.append({
-            "type": 1,
-            "pos": (0.0, 0.0, 0.0),
-            "dir": (-emission_dir.x, -emission_dir.y, -emission_dir.z),
-            "intensity": light.energy * _luminance(light.color),
-            "radius": 0.0,
-        })
+        m = obj.matrix_world
+        lights.append(SceneLight(
+            type=1,
+            pos=(0.0, 0.0, 0.0),
+            dir=(m[0][2], m[1][2], m[2][2]),
+            intensity=intensity,
+            radius=0.0,
+        ))
     else:
         # POINT, SPOT, AREA — world-space position in meters
         pos = obj.matrix_world.translation
@@ -52,126 +129,148 @@ def _collect_light_object(obj, lights):
             radius = max(light.size, getattr(light, 'size_y', light.size)) * 1000
         else:
             radius = light.shadow_soft_size * 1000
-        lights.append({
-            "type": 0,
-            "pos": (pos.x, pos.y, pos.z),
-            "dir": (0.0, 0.0, 0.0),
-            "intensity": light.energy * _luminance(light.color),
-            "radius": radius,
-        })
-
-
-def _collect_emissive_mesh(obj, lights):
-    """Check mesh materials for emission and add as a positional light."""
-    emission = _get_mesh_emission(obj)
+        lights.append(SceneLight(
+            type=0,
+            pos=(pos.x, pos.y, pos.z),
+            dir=(0.0, 0.0, 0.0),
+            intensity=intensity,
+            radius=radius,
+        ))
+
+
+def _collect_emissive_mesh(obj, lights, material_cache):
+    """Check mesh materials for emission and add as a positional light.
+
+    Returns whether a light was added.
+    """
+    emission = _get_mesh_emission(obj, material_cache)
     if emission is None:
-        return
+        return False
 
     strength, color_r, color_g, color_b = emission
-    intensity = strength * _luminance((color_r, color_g, color_b))
+    intensity = strength * (
+        _LUM_R * color_r + _LUM_G * color_g + _LUM_B * color_b)
     if intensity <= 0.0:
-        return
+        return False
 
     pos = obj.matrix_world.translation
     dims = obj.dimensions
     radius = max(dims.x, dims.y, dims.z) * 0.5 * 1000
 
-    lights.append({
-        "type": 0,
-        "pos": (pos.x, pos.y, pos.z),
-        "dir": (0.0, 0.0, 0.0),
-        "intensity": intensity,
-        "radius": radius,
-    })
+    lights.append(SceneLight(
+        type=0,
+        pos=(pos.x, pos.y, pos.z),
+        dir=(0.0, 0.0, 0.0),
+        intensity=intensity,
+        radius=radius,
+    ))
+    return True
+
+
+# Shader nodes _get_mesh_emission() reads emission from
+_EMISSIVE_NODE_TYPES = frozenset(('EMISSION', 'BSDF_PRINCIPLED'))
 
 
-def _get_mesh_emission(obj):
+def _get_mesh_emission(obj, material_cache):
     """Extract emission (strength, r, g, b) from an object's materials.
 
     Checks for Emission shader nodes and Principled BSDF emission.
-    Returns the brightest emission found, or None.
+    Returns the brightest emission found, or None. material_cache maps
+    material pointers to _get_material_emission() results, so materials
+    shared between meshes are only scanned once per collection.
     """
     best = None
     best_intensity = 0.0
 
     for slot in obj.material_slots:
         mat = slot.material
-        if mat is None or not mat.use_nodes:
+        if mat is None:
             continue
+        key = mat.as_pointer()
+        cached = material_cache.get(key)
+        if cached is None:
+            cached = material_cache[key] = _get_material_emission(mat)
+        intensity, emission = cached
+        if intensity > best_intensity:
+            best_intensity = intensity
+            best = emission
 
-        for node in mat.node_tree.nodes:
-            strength = 0.0
-            color = (1.0, 1.0, 1.0)
+    return best
 
-            if node.type == 'EMISSION':
-                color = _socket_default(node.inputs['Color'], (1.0, 1.0, 1.0))
-                strength = _socket_default(node.inputs['Strength'], 1.0)
 
-            elif node.type == 'BSDF_PRINCIPLED':
-                strength = _socket_default(
-                    node.inputs.get('Emission Strength'), 0.0)
-                if strength <= 0.0:
-                    continue
-                color = _socket_default(
-                    node.inputs.get('Emission Color'), (1.0, 1.0, 1.0))
+def _get_material_emission(mat):
+    """Return (intensity, (strength, r, g, b) or None) for one material."""
+    best = None
+    best_intensity = 0.0
+    if not mat.use_nodes:
+        return best_intensity, best
 
-            else:
+    for node in mat.node_tree.nodes:
+        node_type = node.type
+        if node_type not in _EMISSIVE_NODE_TYPES:
+            continue
+
+        if node_type == 'EMISSION':
+            color = _socket_color(node.inputs['Color'], (1.0, 1.0, 1.0))
+            strength = _socket_float(node.inputs['Strength'], 1.0)
+
+        else:
+            strength = _socket_float(
+                node.inputs.get('Emission Strength'), 0.0)
+            if strength <= 0.0:
                 continue
+            color = _socket_color(
+                node.inputs.get('Emission Color'), (1.0, 1.0, 1.0))
 
-            intensity = strength * _luminance(color)
-            if intensity > best_intensity:
-                best_intensity = intensity
-                best = (strength, color[0], color[1], color[2])
+        intensity = strength * (
+            _LUM_R * color[0] + _LUM_G * color[1] + _LUM_B * color[2])
+        if intensity > best_intensity:
+            best_intensity = intensity
+            best = (strength, color[0], color[1], color[2])
 
-    return best
+    return best_intensity, best
 
 
-def _socket_default(socket, fallback):
-    """Get a socket's default value, or fallback if socket is None."""
+def _socket_color(socket, fallback):
+    """Get a color socket's default RGB, or fallback if socket is None."""
     if socket is None:
         return fallback
     val = socket.default_value
-    if hasattr(val, '__len__'):
-        return tuple(val)[:len(fallback)] if hasattr(fallback, '__len__') else val
-    return float(val)
+    return (val[0], val[1], val[2])
 
 
-def _luminance(color):
-    return 0.2126 * color[0] + 0.7152 * color[1] + 0.0722 * color[2]
+def _socket_float(socket, fallback):
+    """Get a float socket's default value, or fallback if socket is None."""
+    if socket is None:
+        return fallback
+    return float(socket.default_value)
+
+
+# Everything in the scene lights block that doesn't depend on the lights
+_SCENE_LIGHTS_HEADER = f"""\
+#define MAX_LIGHTS {MAX_LIGHTS}
+#define MAX_LIGHTS_3 {MAX_LIGHTS * 3}
+
+void load_scene_lights(
+    output int num_lights,
+    output int light_types[MAX_LIGHTS],
+    output float light_pos[MAX_LIGHTS_3],
+    output float light_dir[MAX_LIGHTS_3],
+    output float light_intensity[MAX_LIGHTS],
+    output float light_radius[MAX_LIGHTS])
+{{
+"""
 
 
 def generate_load_scene_lights(lights):
     """Generate an OSL function body that loads scene light data."""
-    max3 = MAX_LIGHTS * 3
-    lines = [
-        f"#define MAX_LIGHTS {MAX_LIGHTS}",
-        f"#define MAX_LIGHTS_3 {max3}",
-        "",
-        "void load_scene_lights(",
-        "    output int num_lights,",
-        "    output int light_types[MAX_LIGHTS],",
-        "    output float light_pos[MAX_LIGHTS_3],",
-        "    output float light_dir[MAX_LIGHTS_3],",
-        "    output float light_intensity[MAX_LIGHTS],",
-        "    output float light_radius[MAX_LIGHTS])",
-        "{",
-        f"    num_lights = {len(lights)};",
-    ]
-
-    for i, lt in enumerate(lights):
-        lines.append(f"    light_types[{i}] = {lt['type']};")
-        lines.append(
-            f"    light_pos[{i*3}] = {lt['pos'][0]};  "
-            f"light_pos[{i*3+1}] = {lt['pos'][1]};  "
-            f"light_pos[{i*3+2}] = {lt['pos'][2]};"
-        )
-        lines.append(
-            f"    light_dir[{i*3}] = {lt['dir'][0]};  "
-            f"light_dir[{i*3+1}] = {lt['dir'][1]};  "
-            f"light_dir[{i*3+2}] = {lt['dir'][2]};"
-        )
-        lines.append(f"    light_intensity[{i}] = {lt['intensity']};")
-        lines.append(f"    light_radius[{i}] = {lt['radius']};")
-
-    lines.append("}")
-    return "\n".join(lines)
+    body = "".join(
+        _LIGHT_FMT.format(i=i, i3=i * 3, i3_1=i * 3 + 1, i3_2=i * 3 + 2, lt=lt)
+        for i, lt in enumerate(lights)
+    )
+    return "".join((
+        _SCENE_LIGHTS_HEADER,
+        "    num_lights = %d;\n" % len(lights),
+        body,
+        "}",
+    ))
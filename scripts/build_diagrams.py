@@ -1,14 +1,19 @@
 """Generate lens diagram PNGs from TOML lens prescriptions using Pillow."""
 # /// script
 # requires-python = ">=3.11"
-# dependencies = ["pillow"]
+# dependencies = ["numpy", "pillow"]
 # ///
 
-import math
+import hashlib
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, partial
+from math import copysign, sqrt
 from pathlib import Path
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image, ImageDraw, UnidentifiedImageError
+from PIL.PngImagePlugin import PngInfo
 
 _ADDON_DIR = Path(__file__).resolve().parent.parent / "addon"
 
@@ -28,6 +33,8 @@ _CEMENTED_LINE = (217, 217, 217, 128)
 _STOP_COLOR = (217, 217, 217, 255)
 _AXIS_COLOR = (255, 255, 255, 140)
 _RAY_COLOR = (255, 190, 100, 160)
+# PNG text chunk holding the _source_hash() a diagram was rendered from
+_HASH_KEY = "source-hash"
 
 
 def _is_stop(s):
@@ -76,17 +83,67 @@ def _arc_x(vertex_x, radius, y):
     y_sq = y * y
     if y_sq >= r_sq:
         return vertex_x
-    return center_x - math.copysign(math.sqrt(r_sq - y_sq), radius)
+    return center_x - copysign(sqrt(r_sq - y_sq), radius)
 
 
-def _arc_points(vertex_x, radius, semi_ap, to_px, steps=64):
+def _to_px_points(xs, ys, xform):
+    """Map arrays of lens coordinates to a list of pixel (x, y) tuples.
+
+    xform is the (x_offset, scale, y_center) lens-to-pixel mapping of to_px(),
+    applied to all points at once.
+    """
+    x_offset, scale, y_center = xform
+    px = x_offset + xs * scale
+    py = y_center - ys * scale
+    return list(zip(px.tolist(), py.tolist()))
+
+
+def _arc_points(vertex_x, radius, semi_ap, xform, steps=64):
     """Return list of pixel (x, y) tuples along an arc."""
-    points = []
-    for i in range(steps + 1):
-        y = -semi_ap + (2 * semi_ap) * i / steps
-        x = _arc_x(vertex_x, radius, y)
-        points.append(to_px(x, y))
-    return points
+    y = -semi_ap + (2 * semi_ap) * np.arange(steps + 1) / steps
+    if radius == 0.0:
+        x = np.full_like(y, vertex_x)
+    else:
+        # _arc_x() over all samples: past the arc's reach, fall back to vertex_x
+        d = radius * radius - y * y
+        root = np.sqrt(np.maximum(d, 0.0))
+        x = np.where(d > 0.0, (vertex_x + radius) - copysign(1.0, radius) * root, vertex_x)
+    return _to_px_points(x, y, xform)
+
+
+def _arc_crossing(front_vx, front_r, back_vx, back_r):
+    """Height where two surface arcs meet, or None if their caps don't meet.
+
+    Surface centers lie on the axis, so the arcs meet at +/-y: intersect the
+    two circles (a flat surface being the vertical line through its vertex)
+    and keep the result only if it lies on both drawn caps.
+    """
+    if front_r == 0.0 and back_r == 0.0:
+        return None
+    if front_r == 0.0:
+        x = front_vx
+    elif back_r == 0.0:
+        x = back_vx
+    else:
+        # Subtracting the two circle equations leaves a linear equation in x
+        front_c = front_vx + front_r
+        back_c = back_vx + back_r
+        if front_c == back_c:
+            return None
+        x = ((front_r * front_r - back_r * back_r)
+             - (front_c * front_c - back_c * back_c)) / (2 * (back_c - front_c))
+    y_sq = None
+    for vx, r in ((front_vx, front_r), (back_vx, back_r)):
+        if r == 0.0:
+            continue
+        dx = x - (vx + r)
+        if dx * r > 0.0:
+            # On the far side of the sphere, not the cap _arc_x() draws
+            return None
+        y_sq = r * r - dx * dx
+    if y_sq < 0.0:
+        return None
+    return sqrt(y_sq)
 
 
 def _effective_semi_aperture(front_vx, front_r, front_ap, back_vx, back_r, back_ap):
@@ -94,7 +151,11 @@ def _effective_semi_aperture(front_vx, front_r, front_ap, back_vx, back_r, back_
     max_ap = min(front_ap, back_ap)
     if _arc_x(front_vx, front_r, max_ap) <= _arc_x(back_vx, back_r, max_ap):
         return front_ap, back_ap
-    # Binary search for the crossing height
+    y = _arc_crossing(front_vx, front_r, back_vx, back_r)
+    if y is not None and y <= max_ap:
+        return y, y
+    # The arcs only cross where _arc_x() clamps a cap to its vertex (an
+    # aperture beyond the radius); bisect for the crossing height there.
     lo, hi = 0.0, max_ap
     for _ in range(50):
         mid = (lo + hi) * 0.5
@@ -105,16 +166,8 @@ def _effective_semi_aperture(front_vx, front_r, front_ap, back_vx, back_r, back_
     return lo, lo
 
 
-def _element_polygon(surfaces, positions, front_i, back_i, effective_aps, to_px):
-    """Build a polygon outline for a glass element between two surfaces."""
-    front_vx = positions[front_i]
-    back_vx = positions[back_i]
-    front_r = _diagram_radius(surfaces[front_i])
-    back_r = _diagram_radius(surfaces[back_i])
-
-    front_pts = _arc_points(front_vx, front_r, effective_aps[front_i], to_px)
-    back_pts = _arc_points(back_vx, back_r, effective_aps[back_i], to_px)
-
+def _element_polygon(front_pts, back_pts):
+    """Build a polygon outline for a glass element from its two surface arcs."""
     polygon = list(front_pts)
     polygon.append(back_pts[-1])
     polygon.extend(reversed(back_pts))
@@ -126,7 +179,7 @@ def _element_polygon(surfaces, positions, front_i, back_i, effective_aps, to_px)
 def _draw_dashed_line(draw, x0, y0, x1, y1, color, width, dash=8, gap=6):
     dx = x1 - x0
     dy = y1 - y0
-    length = math.sqrt(dx * dx + dy * dy)
+    length = sqrt(dx * dx + dy * dy)
     if length < 1:
         return
     nx, ny = dx / length, dy / length
@@ -141,13 +194,11 @@ def _draw_dashed_line(draw, x0, y0, x1, y1, color, width, dash=8, gap=6):
         pos = end + gap
 
 
-def _draw_arc(draw, vertex_x, radius, semi_ap, to_px, color, width):
-    points = _arc_points(vertex_x, radius, semi_ap, to_px)
-    draw.line(points, fill=color, width=width)
-
+def _trace_ray(positions, radii, semi_aps, iors, start_y):
+    """Trace a parallel ray at given height through the lens. Returns point list or None.
 
-def _trace_ray(surfaces, positions, start_y):
-    """Trace a parallel ray at given height through the lens. Returns point list or None."""
+    The lens is given as parallel per-surface lists, as built by _render_lens().
+    """
     ox = positions[0] - positions[-1] * 0.1
     oy = start_y
     dx, dy = 1.0, 0.0
@@ -155,11 +206,7 @@ def _trace_ray(surfaces, positions, start_y):
     points = [(ox, oy)]
     n1 = 1.0
 
-    for i, s in enumerate(surfaces):
-        vx = positions[i]
-        radius = _diagram_radius(s)
-        semi_ap = s["aperture"] * 0.5
-        n2 = s["ior"]
+    for vx, radius, semi_ap, n2 in zip(positions, radii, semi_aps, iors):
 
         if radius == 0.0:
             if abs(dx) < 1e-12:
@@ -186,7 +233,7 @@ def _trace_ray(surfaces, positions, start_y):
         disc = b * b - 4 * a * c
         if disc < 0:
             return None
-        sqrt_disc = math.sqrt(disc)
+        sqrt_disc = sqrt(disc)
         t1 = (-b - sqrt_disc) / (2 * a)
         t2 = (-b + sqrt_disc) / (2 * a)
 
@@ -220,10 +267,10 @@ def _trace_ray(surfaces, positions, start_y):
             sin2_t = eta * eta * (1 - cos_i * cos_i)
             if sin2_t > 1.0:
                 return None
-            cos_t = math.sqrt(1 - sin2_t)
+            cos_t = sqrt(1 - sin2_t)
             dx = eta * dx + (eta * cos_i - cos_t) * nx
             dy = eta * dy + (eta * cos_i - cos_t) * ny
-            length = math.sqrt(dx * dx + dy * dy)
+            length = sqrt(dx * dx + dy * dy)
             dx /= length
             dy /= length
 
@@ -236,12 +283,70 @@ def _trace_ray(surfaces, positions, start_y):
     return points
 
 
-def _render_lens(surfaces):
+@cache
+def _axis_canvas():
+    """Blank canvas with the dashed optical axis, which every diagram shares."""
     size = _RENDER_SIZE
     img = Image.new("RGBA", (size, size), _BG_COLOR)
+    y_center = size * 0.5
+    _draw_dashed_line(
+        ImageDraw.Draw(img), _PADDING * 0.5, y_center, size - _PADDING * 0.5, y_center,
+        _AXIS_COLOR, 1 * _SUPERSAMPLE,
+        dash=8 * _SUPERSAMPLE, gap=6 * _SUPERSAMPLE,
+    )
+    return img
+
+
+def _clip_polyline(points, left, right):
+    """Clip a polyline to the vertical band left <= x <= right.
+
+    Liang-Barsky: each segment is cut to the parameter range [t0, t1] where
+    it lies inside the band. Keeps each surviving segment's clipped start,
+    plus the clipped end of the last segment.
+    """
+    clipped = []
+    last = len(points) - 2
+    for j in range(last + 1):
+        ax, ay = points[j]
+        bx, by = points[j + 1]
+        dx = bx - ax
+        if abs(dx) < 1e-6:
+            if left <= ax <= right:
+                clipped.append((ax, ay))
+                if j == last:
+                    clipped.append((bx, by))
+            continue
+        t0 = (left - ax) / dx
+        t1 = (right - ax) / dx
+        if dx < 0:
+            t0, t1 = t1, t0
+        t0 = max(t0, 0.0)
+        t1 = min(t1, 1.0)
+        if t0 >= t1:
+            continue
+        dy = by - ay
+        clipped.append((ax + t0 * dx, ay + t0 * dy))
+        if j == last:
+            clipped.append((ax + t1 * dx, ay + t1 * dy))
+    return clipped
+
+
+def _render_lens(surfaces):
+    size = _RENDER_SIZE
+    img = _axis_canvas().copy()
     draw = ImageDraw.Draw(img)
 
     elements = _find_elements(surfaces)
+    # Per-surface values used throughout, looked up once
+    radii = [_diagram_radius(s) for s in surfaces]
+    is_stop = [_is_stop(s) for s in surfaces]
+    semi_aps = [s["aperture"] * 0.5 for s in surfaces]
+    iors = [s["ior"] for s in surfaces]
+    # Surfaces strictly inside an element are cemented glass-glass interfaces
+    cemented = [False] * len(surfaces)
+    for front_i, back_i in elements:
+        for k in range(front_i + 1, back_i):
+            cemented[k] = True
     max_aperture = max(s["aperture"] for s in surfaces) * 0.5
 
     # Adaptive padding: reduce vertical padding for lenses where height
@@ -273,79 +378,62 @@ def _render_lens(surfaces):
         py = y_center - lens_y * scale
         return (px, py)
 
-    # Optical axis
-    _draw_dashed_line(
-        draw, _PADDING * 0.5, y_center, size - _PADDING * 0.5, y_center,
-        _AXIS_COLOR, 1 * _SUPERSAMPLE,
-        dash=8 * _SUPERSAMPLE, gap=6 * _SUPERSAMPLE,
-    )
+    xform = (x_offset, scale, y_center)
 
     # Compute effective drawing aperture for every surface, clamped where
     # adjacent arcs would cross — both within elements and across air gaps.
     effective_aps = []
-    for i, s in enumerate(surfaces):
-        eff = s["aperture"] * 0.5
-        if i > 0 and not _is_stop(surfaces[i - 1]):
-            s_prev = surfaces[i - 1]
+    for i in range(len(surfaces)):
+        eff = semi_aps[i]
+        if i > 0 and not is_stop[i - 1]:
             _, back_ap = _effective_semi_aperture(
-                positions[i - 1], _diagram_radius(s_prev), s_prev["aperture"] * 0.5,
-                positions[i], _diagram_radius(s), eff,
+                positions[i - 1], radii[i - 1], semi_aps[i - 1],
+                positions[i], radii[i], eff,
             )
             eff = min(eff, back_ap)
-        if i < len(surfaces) - 1 and not _is_stop(surfaces[i + 1]):
-            s_next = surfaces[i + 1]
+        if i < len(surfaces) - 1 and not is_stop[i + 1]:
             front_ap, _ = _effective_semi_aperture(
-                positions[i], _diagram_radius(s), eff,
-                positions[i + 1], _diagram_radius(s_next), s_next["aperture"] * 0.5,
+                positions[i], radii[i], eff,
+                positions[i + 1], radii[i + 1], semi_aps[i + 1],
             )
             eff = min(eff, front_ap)
         effective_aps.append(eff)
 
+    # Pixel arc of every surface at its effective aperture, shared by the
+    # glass fill, the surface strokes and the closing edges. Each arc runs
+    # from -aperture to +aperture, so its ends are the edge corners.
+    arc_pts = [
+        _arc_points(positions[i], radii[i], effective_aps[i], xform)
+        for i in range(len(surfaces))
+    ]
+
     # Fill glass elements
     for front_i, back_i in elements:
         for j in range(front_i, back_i):
-            poly = _element_polygon(surfaces, positions, j, j + 1, effective_aps, to_px)
+            poly = _element_polygon(arc_pts[j], arc_pts[j + 1])
             draw.polygon(poly, fill=_GLASS_FILL)
 
     # Draw surface arcs
-    for i, s in enumerate(surfaces):
-        if _is_stop(s):
+    for i in range(len(surfaces)):
+        if is_stop[i]:
             continue
-        semi_ap = effective_aps[i]
-        r = _diagram_radius(s)
-        is_cemented = False
-        for front_i, back_i in elements:
-            if front_i < i < back_i:
-                is_cemented = True
-                break
-        if is_cemented:
-            _draw_arc(draw, positions[i], r, semi_ap, to_px,
-                       _CEMENTED_LINE, 2 * _SUPERSAMPLE)
+        if cemented[i]:
+            draw.line(arc_pts[i], fill=_CEMENTED_LINE, width=2 * _SUPERSAMPLE)
         else:
-            _draw_arc(draw, positions[i], r, semi_ap, to_px,
-                       _SURFACE_LINE, 2 * _SUPERSAMPLE)
+            draw.line(arc_pts[i], fill=_SURFACE_LINE, width=2 * _SUPERSAMPLE)
 
     # Draw element closing edges
     for front_i, back_i in elements:
         for j in range(front_i, back_i):
-            ap_j = effective_aps[j]
-            ap_j1 = effective_aps[j + 1]
-            for sign in (1.0, -1.0):
-                p0 = to_px(
-                    _arc_x(positions[j], _diagram_radius(surfaces[j]), sign * ap_j),
-                    sign * ap_j,
-                )
-                p1 = to_px(
-                    _arc_x(positions[j + 1], _diagram_radius(surfaces[j + 1]), sign * ap_j1),
-                    sign * ap_j1,
-                )
-                draw.line([p0, p1], fill=_SURFACE_LINE, width=2 * _SUPERSAMPLE)
+            for end in (-1, 0):
+                draw.line([arc_pts[j][end], arc_pts[j + 1][end]],
+                          fill=_SURFACE_LINE, width=2 * _SUPERSAMPLE)
 
     # Draw aperture stop
-    for i, s in enumerate(surfaces):
-        if _is_stop(s):
+    for i in range(len(surfaces)):
+        if is_stop[i]:
             stop_x = positions[i]
-            semi_ap = s["aperture"] * 0.5
+            semi_ap = semi_aps[i]
             notch = semi_ap * 0.15
             px_stop, _ = to_px(stop_x, 0)
             for sign in (1.0, -1.0):
@@ -367,47 +455,52 @@ def _render_lens(surfaces):
     # height, since it defines the actual ray bundle that passes through
     # the system. For retrofocus designs the front element is much larger
     # than the useful ray bundle.
-    stop_aps = [s["aperture"] * 0.5 for s in surfaces if _is_stop(s)]
-    ray_semi_ap = stop_aps[0] if stop_aps else (
-        min(s["aperture"] * 0.5 for s in surfaces)
-    )
+    stop_aps = [ap for ap, stop in zip(semi_aps, is_stop) if stop]
+    ray_semi_ap = stop_aps[0] if stop_aps else min(semi_aps)
     clip_left = _PADDING * 0.5
     clip_right = size - _PADDING * 0.5
     for frac in (0.7, 0.5, 0.35, -0.35, -0.5, -0.7):
-        ray_pts = _trace_ray(surfaces, positions, frac * ray_semi_ap)
+        ray_pts = _trace_ray(positions, radii, semi_aps, iors, frac * ray_semi_ap)
         if ray_pts and len(ray_pts) >= 2:
-            px_pts = [to_px(x, y) for x, y in ray_pts]
-            # Clip to drawing area
-            clipped = []
-            for j in range(len(px_pts) - 1):
-                ax, ay = px_pts[j]
-                bx, by = px_pts[j + 1]
-                dx = bx - ax
-                if abs(dx) < 1e-6:
-                    if clip_left <= ax <= clip_right:
-                        clipped.append((ax, ay))
-                        if j == len(px_pts) - 2:
-                            clipped.append((bx, by))
-                    continue
-                if ax < clip_left:
-                    if bx <= clip_left:
-                        continue
-                    t = (clip_left - ax) / dx
-                    ax = clip_left
-                    ay = ay + t * (by - ay)
-                if bx > clip_right:
-                    if ax >= clip_right:
-                        continue
-                    t = (clip_right - ax) / dx
-                    bx = clip_right
-                    by = ay + t * (by - ay)
-                clipped.append((ax, ay))
-                if j == len(px_pts) - 2:
-                    clipped.append((bx, by))
+            xs, ys = np.array(ray_pts).T
+            px_pts = _to_px_points(xs, ys, xform)
+            clipped = _clip_polyline(px_pts, clip_left, clip_right)
             if len(clipped) >= 2:
                 draw.line(clipped, fill=_RAY_COLOR, width=1 * _SUPERSAMPLE)
 
-    return img.resize((_ICON_SIZE, _ICON_SIZE), Image.LANCZOS)
+    # Box-average each _SUPERSAMPLE^2 block down to the icon size; for flat
+    # vector art this antialiases as well as a Lanczos resample, at a
+    # fraction of the cost
+    return img.reduce(_SUPERSAMPLE)
+
+
+def _source_hash(toml_path):
+    """Digest of a lens file and this script, which together fix its diagram."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(Path(__file__).read_bytes())
+    digest.update(toml_path.read_bytes())
+    return digest.hexdigest()
+
+
+def _stored_hash(png_path):
+    """The _source_hash() recorded in an existing diagram, or None.
+
+    A missing, truncated or corrupt PNG counts as stale.
+    """
+    try:
+        with Image.open(png_path) as img:
+            return img.text.get(_HASH_KEY)
+    except (OSError, UnidentifiedImageError):
+        return None
+
+
+def _render_and_save(output_dir, lens, source_hash):
+    img = _render_lens(lens["surfaces"])
+    out_path = output_dir / f"{lens['filename_stem']}.png"
+    info = PngInfo()
+    info.add_text(_HASH_KEY, source_hash)
+    img.save(out_path, pnginfo=info)
+    return out_path
 
 
 def main():
@@ -416,13 +509,23 @@ def main():
     output_dir.mkdir(exist_ok=True)
 
     lenses = load_lenses(lens_dir)
+    # Only re-render diagrams whose lens file or renderer changed
+    stale, hashes = [], []
     for lens in lenses:
-        img = _render_lens(lens["surfaces"])
-        out_path = output_dir / f"{lens['filename_stem']}.png"
-        img.save(out_path)
-        print(f"  {out_path.name}")
-
-    print(f"Generated {len(lenses)} diagrams in {output_dir}")
+        source_hash = _source_hash(lens_dir / f"{lens['filename_stem']}.toml")
+        if _stored_hash(output_dir / f"{lens['filename_stem']}.png") != source_hash:
+            stale.append(lens)
+            hashes.append(source_hash)
+
+    # Diagrams are independent, so render and encode them on all cores
+    with ProcessPoolExecutor() as pool:
+        for out_path in pool.map(partial(_render_and_save, output_dir), stale, hashes):
+            print(f"  {out_path.name}")
+
+    print(
+        f"Generated {len(stale)} diagrams in {output_dir} "
+        f"({len(lenses) - len(stale)} unchanged)"
+    )
 
 
 if __name__ == "__main__":